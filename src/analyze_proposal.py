@@ -1,58 +1,136 @@
 import os
-from dotenv import load_dotenv
+import argparse
 from src.discourse_parser import DiscourseParser
 from src.evaluator_agents import EvaluatorAgent
-from src.proposal_analyzer import ProposalAnalyzer
+from src.proposal_analyzer import ProposalAnalyzer, CATEGORIES
 from src.sentiment_analyzer import SentimentAnalyzer
-import json
+from src.proposal_condenser import ProposalCondenser
+from src.text_utils import PROMPT_MAX_COMMENTS
+import orjson
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
-def analyze_proposal(url: str, analyze_sentiment: bool = False) -> dict:
+# Pipeline components shared by every analysis in this process, keyed by class
+_components: Dict[type, Any] = {}
+_components_lock = threading.Lock()
+
+def _shared(component_class: type) -> Any:
+    """
+    Get the instance of a pipeline component shared by every analysis in this process.
+    
+    Components keep their caches in memory and load the similarity cache file when
+    created, so they are built once instead of per proposal. Construction holds a
+    lock, so proposals analyzed concurrently never build a second copy.
+    
+    Args:
+        component_class: Class of the component
+        
+    Returns:
+        The shared instance
+    """
+    with _components_lock:
+        if component_class not in _components:
+            _components[component_class] = component_class()
+        return _components[component_class]
+
+def analyze_proposal(url: str, analyze_sentiment: bool = False,
+                     proposal_data: Optional[Dict[str, Any]] = None) -> dict:
     """
     Analyze a governance proposal using specialized evaluator agents.
     
     Args:
         url: The URL of the proposal to analyze
         analyze_sentiment: Whether to perform sentiment analysis on comments
+        proposal_data: Already parsed proposal details, skips fetching the URL
         
     Returns:
         dict: Analysis results including category scores and detailed evaluations
     """
     # Initialize components
-    parser = DiscourseParser()
-    analyzer = ProposalAnalyzer()
-    evaluator = EvaluatorAgent()
+    analyzer = _shared(ProposalAnalyzer)
+    evaluator = _shared(EvaluatorAgent)
     
     # Step 1: Parse and store proposal data
-    proposal_data = parser.parse_proposal(url)
+    if proposal_data is None:
+        # Without sentiment analysis only the comments quoted in the prompts are needed
+        max_comments = None if analyze_sentiment else PROMPT_MAX_COMMENTS
+        proposal_data = DiscourseParser().parse_proposal(url, max_comments)
+    
+    # Condense very long proposals before they reach the analysis prompts
+    proposal_data = _shared(ProposalCondenser).condense(proposal_data)
     
     # Step 2: Analyze proposal content and determine category
-    analysis_results = analyzer.analyze_proposal({
-        'title': proposal_data['title'],
-        'content': proposal_data['content']
-    })
-    
-    # Extract category scores and get primary category
-    category_weights = {
-        k: v for k, v in analysis_results.items() 
-        if k not in ['sum', 'primary_category', 'summary']
-    }
+    analysis_results = analyzer.analyze_proposal(proposal_data)
+    
+    # Get the primary category
     primary_category = analysis_results.get('primary_category')
     
-    # Get detailed evaluation from specialized agent
-    detailed_evaluation = evaluator.evaluate_proposal(primary_category, proposal_data)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Get detailed evaluation from specialized agent
+        evaluation_future = executor.submit(evaluator.evaluate_proposal, primary_category, proposal_data)
+        
+        # Step 3: Analyze comments if requested, alongside the evaluation
+        comment_analysis_future = None
+        if analyze_sentiment and proposal_data.get('comments'):
+            sentiment_analyzer = _shared(SentimentAnalyzer)
+            comment_analysis_future = executor.submit(
+                sentiment_analyzer.analyze_all_comments,
+                proposal_data['comments'],
+                analysis_results['summary']
+            )
+        
+        detailed_evaluation = evaluation_future.result()
+        comment_analysis = comment_analysis_future.result() if comment_analysis_future else None
+    
+    return combine_results(url, proposal_data, analysis_results, detailed_evaluation, comment_analysis)
+
+def full_evaluate(proposal_data: Dict[str, Any], min_weight: float = 0.05) -> dict:
+    """
+    Categorize a proposal and evaluate it with every relevant category agent.
+    
+    Most proposals span two or three categories, so agents for categories
+    the analyzer weighted at or below `min_weight` are not called. The
+    default of 0.05 is the middle of the 0.0-0.1 band the scoring prompt
+    reserves for minor aspects.
+    
+    Args:
+        proposal_data: Parsed proposal details
+        min_weight: Categories weighted at or below this are not evaluated
+        
+    Returns:
+        dict: The category analysis, the weighted evaluation score and the evaluations by category
+    """
+    proposal_data = _shared(ProposalCondenser).condense(proposal_data)
+    analysis_results = _shared(ProposalAnalyzer).analyze_proposal(proposal_data)
+    category_weights = {c: analysis_results[c] for c in CATEGORIES}
+    evaluation = _shared(EvaluatorAgent).evaluate_all_categories(proposal_data, category_weights, min_weight)
+    
+    return {
+        "analysis": analysis_results,
+        "score": evaluation['score'],
+        "evaluations": evaluation['evaluations']
+    }
+
+def combine_results(url: str, proposal_data: Dict[str, Any], analysis_results: Dict[str, Any],
+                    detailed_evaluation: Dict[str, Any], comment_analysis: Optional[Dict[str, Any]]) -> dict:
+    """
+    Combine the outputs of the analysis steps into the saved result format.
     
-    # Step 3: Analyze comments if requested
-    comment_analysis = None
-    if analyze_sentiment and proposal_data.get('comments'):
-        sentiment_analyzer = SentimentAnalyzer()
-        comment_analysis = sentiment_analyzer.analyze_all_comments(
-            proposal_data['comments'],
-            analysis_results['summary']
-        )
+    Args:
+        url: The URL of the proposal
+        proposal_data: Parsed proposal details
+        analysis_results: Category weights and summary from the proposal analyzer
+        detailed_evaluation: Evaluation from the primary category's agent
+        comment_analysis: Sentiment analysis of the comments, if any
+        
+    Returns:
+        dict: Analysis results including category scores and detailed evaluations
+    """
+    category_weights = {c: analysis_results[c] for c in CATEGORIES}
+    primary_category = analysis_results.get('primary_category')
     
-    # Combine results
     results = {
         "proposal": {
             "url": url,
@@ -78,8 +156,65 @@ def analyze_proposal(url: str, analyze_sentiment: bool = False) -> dict:
     
     return results
 
+def analyze_proposals_batch(urls: List[str], proposals_data: List[Dict[str, Any]],
+                            analyze_sentiment: bool = False) -> List[dict]:
+    """
+    Analyze many parsed proposals, evaluating them through the Message Batches API.
+    
+    The batch is billed at half price but can take hours to complete, so this
+    suits offline runs over many proposals rather than interactive use.
+    
+    Args:
+        urls: The URLs of the proposals
+        proposals_data: Parsed proposal details, in the same order as `urls`
+        analyze_sentiment: Whether to perform sentiment analysis on comments
+        
+    Returns:
+        list: Analysis results in the same order as `urls`
+    """
+    condenser = _shared(ProposalCondenser)
+    analyzer = _shared(ProposalAnalyzer)
+    evaluator = _shared(EvaluatorAgent)
+    sentiment_analyzer = _shared(SentimentAnalyzer) if analyze_sentiment else None
+    
+    # Categorize every proposal first, the evaluations depend on the primary category
+    with ThreadPoolExecutor(max_workers=min(8, len(urls) or 1)) as executor:
+        proposals_data = list(executor.map(condenser.condense, proposals_data))
+        analyses = list(executor.map(analyzer.analyze_proposal, proposals_data))
+        
+        comment_futures = [
+            executor.submit(sentiment_analyzer.analyze_all_comments, proposal_data['comments'], analysis['summary'])
+            if sentiment_analyzer and proposal_data.get('comments') else None
+            for proposal_data, analysis in zip(proposals_data, analyses)
+        ]
+        
+        # Proposals the analyzer failed on have no category to evaluate
+        evaluated = [i for i, analysis in enumerate(analyses) if analysis['primary_category'] in CATEGORIES]
+        evaluations = dict(zip(evaluated, evaluator.evaluate_batch(
+            [(analyses[i]['primary_category'], proposals_data[i]) for i in evaluated]
+        )))
+        
+        return [
+            combine_results(
+                url, proposal_data, analysis,
+                evaluations.get(i, {}),
+                comment_future.result() if comment_future else None
+            )
+            for i, (url, proposal_data, analysis, comment_future)
+            in enumerate(zip(urls, proposals_data, analyses, comment_futures))
+        ]
+
 def main():
     """Main function to analyze multiple proposals"""
+    arg_parser = argparse.ArgumentParser(description="Analyze governance proposals from Discourse forums")
+    arg_parser.add_argument("urls", nargs="*", help="Proposal URLs to analyze (defaults to the sample proposals)")
+    arg_parser.add_argument("--analyze-sentiment", action="store_true",
+                            help="Also analyze the sentiment of proposal comments")
+    arg_parser.add_argument("--batch", action="store_true",
+                            help="Run the detailed evaluations through the Message Batches API "
+                                 "(half price, but may take hours to complete)")
+    args = arg_parser.parse_args()
+    
     # Test proposals
     proposals = [
         {
@@ -88,21 +223,63 @@ def main():
             "expected_category": "treasury_management"
         }
     ]
+    if args.urls:
+        # Name proposals given on the command line after their topic slug
+        proposals = [
+            {"name": url.rstrip('/').split('/t/')[-1].split('/')[0], "url": url}
+            for url in args.urls
+        ]
+    
+    # Fetch all proposals up front so their network round-trips overlap
+    parsed_proposals = DiscourseParser().parse_proposals(
+        [p['url'] for p in proposals],
+        max_comments=None if args.analyze_sentiment else PROMPT_MAX_COMMENTS
+    )
+    
+    if args.batch:
+        # Analyze the proposals that parsed as one batch, keeping parse errors in place
+        parsed = [
+            (proposal['url'], proposal_data) for proposal, proposal_data in zip(proposals, parsed_proposals)
+            if not isinstance(proposal_data, Exception)
+        ]
+        batch_results = iter(analyze_proposals_batch(
+            [url for url, _ in parsed], [proposal_data for _, proposal_data in parsed],
+            analyze_sentiment=args.analyze_sentiment
+        ))
+        outcomes = [
+            proposal_data if isinstance(proposal_data, Exception) else next(batch_results)
+            for proposal_data in parsed_proposals
+        ]
+    else:
+        def analyze_parsed(url: str, proposal_data: Any) -> Any:
+            if isinstance(proposal_data, Exception):
+                return proposal_data
+            try:
+                return analyze_proposal(url, analyze_sentiment=args.analyze_sentiment, proposal_data=proposal_data)
+            except Exception as e:
+                return e
+        
+        # The proposals are independent, so analyze them concurrently, each one runs its own inner pools
+        with ThreadPoolExecutor(max_workers=min(8, len(proposals))) as executor:
+            outcomes = list(executor.map(
+                analyze_parsed, [proposal['url'] for proposal in proposals], parsed_proposals
+            ))
     
-    for proposal in proposals:
+    for proposal, outcome in zip(proposals, outcomes):
         try:
             print(f"\n{'='*50}")
             print(f"Analyzing: {proposal['name']}")
             print(f"URL: {proposal['url']}")
             print(f"{'='*50}")
             
-            # Analyze the proposal with sentiment analysis disabled
-            results = analyze_proposal(proposal['url'], analyze_sentiment=False)
+            if isinstance(outcome, Exception):
+                raise outcome
+            results = outcome
             
             # Save results to a JSON file
             output_file = f"analysis_results_{proposal['name'].lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(output_file, 'w') as f:
-                json.dump(results, f, indent=2)
+            with open(output_file, 'wb') as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
                 
             print(f"\nAnalysis complete! Results saved to {output_file}")
             
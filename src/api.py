@@ -1,18 +1,34 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, List
 import logging
-from src.proposal_analyzer import ProposalAnalyzer
+from src.proposal_analyzer import ProposalAnalyzer, CATEGORIES
 from src.sentiment_analyzer import SentimentAnalyzer
 from src.discourse_parser import DiscourseParser
 from src.evaluator_agents import EvaluatorAgent
+from src.proposal_condenser import ProposalCondenser
+from src.text_utils import PROMPT_MAX_COMMENTS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the parser and analyzers once and share them across requests"""
+    app.state.parser = DiscourseParser()
+    app.state.condenser = ProposalCondenser()
+    app.state.analyzer = ProposalAnalyzer()
+    app.state.evaluator = EvaluatorAgent()
+    app.state.sentiment_analyzer = SentimentAnalyzer()
+    yield
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -29,6 +45,7 @@ class AnalyzeRequest(BaseModel):
 
 class SentimentRequest(BaseModel):
     comments: List[Dict]
+    proposal_summary: Optional[str] = ""
 
 class KeyFinding(BaseModel):
     aspect: str
@@ -55,6 +72,7 @@ class Proposal(BaseModel):
 
 class CommentAnalysis(BaseModel):
     sentiment_score: float
+    sentiment_std: float = 0.0
     summary: str
     key_points: List[str]
     concerns: List[str]
@@ -82,40 +100,62 @@ async def analyze_proposal(request: AnalyzeRequest):
         
         # Parse the proposal from the URL
         try:
-            parser = DiscourseParser()
-            proposal_data = parser.parse_proposal(request.url)
+            # Without sentiment analysis only the comments quoted in the prompts are needed
+            max_comments = None if request.include_sentiment else PROMPT_MAX_COMMENTS
+            proposal_data = await run_in_threadpool(app.state.parser.parse_proposal, request.url, max_comments)
             logger.info("Successfully parsed proposal data")
+            
+            # Condense very long proposals before they reach the analysis prompts
+            proposal_data = await run_in_threadpool(app.state.condenser.condense, proposal_data)
         except Exception as e:
             logger.error(f"Error parsing proposal: {str(e)}")
             raise HTTPException(status_code=400, detail=f"Error parsing proposal: {str(e)}")
         
         # Analyze proposal content and determine category
         try:
-            analyzer = ProposalAnalyzer()
-            analysis_results = analyzer.analyze_proposal({
-                'title': proposal_data['title'],
-                'content': proposal_data['content']
-            })
+            analysis_results = await run_in_threadpool(app.state.analyzer.analyze_proposal, proposal_data)
             logger.info("Successfully analyzed proposal")
         except Exception as e:
             logger.error(f"Error analyzing proposal: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error analyzing proposal: {str(e)}")
         
         # Extract category scores and get primary category
-        try:
-            category_weights = {
-                k: v for k, v in analysis_results.items() 
-                if k not in ['sum', 'primary_category', 'summary']
-            }
-            primary_category = analysis_results.get('primary_category')
-            
+        category_weights = {c: analysis_results[c] for c in CATEGORIES}
+        primary_category = analysis_results.get('primary_category')
+        
+        async def generate_evaluation():
             # Get detailed evaluation from specialized agent
-            evaluator = EvaluatorAgent()
-            detailed_evaluation = evaluator.evaluate_proposal(primary_category, proposal_data)
-            logger.info("Successfully generated detailed evaluation")
-        except Exception as e:
-            logger.error(f"Error generating evaluation: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error generating evaluation: {str(e)}")
+            try:
+                detailed_evaluation = await run_in_threadpool(
+                    app.state.evaluator.evaluate_proposal, primary_category, proposal_data
+                )
+                logger.info("Successfully generated detailed evaluation")
+                return detailed_evaluation
+            except Exception as e:
+                logger.error(f"Error generating evaluation: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Error generating evaluation: {str(e)}")
+        
+        async def generate_sentiment():
+            # Add sentiment analysis if requested
+            if not (request.include_sentiment and proposal_data.get('comments')):
+                return None
+            try:
+                sentiment_result = await run_in_threadpool(
+                    app.state.sentiment_analyzer.analyze_all_comments,
+                    proposal_data['comments'],
+                    analysis_results['summary']  # Pass the proposal summary as context
+                )
+                logger.info("Successfully completed sentiment analysis")
+                return sentiment_result
+            except Exception as e:
+                logger.error(f"Error in sentiment analysis: {str(e)}")
+                # Don't fail the whole request if sentiment analysis fails
+                return None
+        
+        # Both only depend on the category analysis, so run them concurrently
+        detailed_evaluation, sentiment_result = await asyncio.gather(
+            generate_evaluation(), generate_sentiment()
+        )
         
         # Prepare the response
         result = {
@@ -138,20 +178,8 @@ async def analyze_proposal(request: AnalyzeRequest):
             }
         }
         
-        # Add sentiment analysis if requested
-        if request.include_sentiment and proposal_data.get('comments'):
-            try:
-                sentiment_analyzer = SentimentAnalyzer()
-                sentiment_result = sentiment_analyzer.analyze_all_comments(
-                    proposal_data['comments'],
-                    analysis_results['summary']  # Pass the proposal summary as context
-                )
-                result['comment_analysis'] = sentiment_result
-                logger.info("Successfully completed sentiment analysis")
-            except Exception as e:
-                logger.error(f"Error in sentiment analysis: {str(e)}")
-                # Don't fail the whole request if sentiment analysis fails
-                pass
+        if sentiment_result:
+            result['comment_analysis'] = sentiment_result
         
         return result
     except HTTPException:
@@ -166,14 +194,14 @@ async def analyze_sentiment(request: SentimentRequest):
     Analyze sentiment of comments independently.
     
     Args:
-        request: List of comments to analyze
+        request: List of comments to analyze and an optional summary of the proposal for context
         
     Returns:
         dict: Sentiment analysis results including score, summary, and key points
     """
     try:
-        sentiment_analyzer = SentimentAnalyzer()
-        result = sentiment_analyzer.analyze_all_comments(request.comments)
+        result = await run_in_threadpool(app.state.sentiment_analyzer.analyze_all_comments,
+                                         request.comments, request.proposal_summary or "")
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
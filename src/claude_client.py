@@ -1,34 +1,51 @@
-import os
 import logging
-from dotenv import load_dotenv
-import anthropic
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Keep idle connections open across batch polls and sequential pipeline steps
+# instead of the SDK default of 5 seconds, so calls skip the TLS handshake
+CONNECTION_LIMITS = {'max_connections': 50, 'max_keepalive_connections': 20, 'keepalive_expiry': 300}
+
+# Attempts after the first for rate limits, overloads, server errors and dropped connections
+MAX_RETRIES = 5
+
 class ClaudeClient:
     _instance = None
     _client = None
 
-    @classmethod
-    def get_instance(cls):
+    def __new__(cls):
+        # Every construction returns the shared instance
         if cls._instance is None:
-            cls._instance = cls()
+            cls._instance = super().__new__(cls)
         return cls._instance
 
+    @classmethod
+    def get_instance(cls):
+        return cls()
+
     def __init__(self):
         if self._client is not None:
             return
             
+        # The SDK and the .env file are only loaded once a client is needed,
+        # so importing the analyzers stays cheap for code that never calls the API
+        import httpx
+        import anthropic
+        from .config import ANTHROPIC_API_KEY
+        
         try:
-            load_dotenv()
-            api_key = os.getenv('ANTHROPIC_API_KEY')
+            api_key = ANTHROPIC_API_KEY
             if not api_key:
                 logger.error("ANTHROPIC_API_KEY not found in environment variables")
                 raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
             
             logger.info("Initializing Anthropic client")
-            self._client = anthropic.Anthropic(api_key=api_key)
+            self._client = anthropic.Anthropic(
+                api_key=api_key,
+                max_retries=MAX_RETRIES,
+                http_client=anthropic.DefaultHttpxClient(http2=True, limits=httpx.Limits(**CONNECTION_LIMITS))
+            )
             logger.info("Successfully initialized Anthropic client")
         except Exception as e:
             logger.error(f"Error initializing Anthropic client: {str(e)}")
@@ -0,0 +1,9 @@
+"""
+Configuration read once from the environment and the .env file.
+"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
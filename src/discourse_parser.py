@@ -1,15 +1,75 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import orjson
 import requests
-from typing import Dict, Any, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Any, List, Optional, Tuple, TypedDict
 from datetime import datetime
 from .text_utils import clean_html_content
 
+logger = logging.getLogger(__name__)
+
+class Comment(TypedDict):
+    """A cleaned reply to a proposal topic"""
+    content: str
+    created_at: str
+    username: str
+
+class ProposalDetails(TypedDict):
+    """A cleaned proposal topic as returned by DiscourseParser.parse_proposal"""
+    title: str
+    created_at: str
+    content: str
+    comments: List[Comment]
+
 class DiscourseParser:
-    def __init__(self):
-        """Initialize the discourse parser with session setup"""
-        self.session = requests.Session()
-        self.session.headers.update({
+    _session = None
+
+    def __init__(self, cache_ttl: int = 3600, cache_dir: str = '.cache/discourse',
+                 timeout: float = 10.0):
+        """
+        Initialize the discourse parser with session setup.
+        
+        Args:
+            cache_ttl: Seconds a fetched topic is served from the disk cache, 0 disables it
+            cache_dir: Directory holding the cached topic JSON
+            timeout: Seconds to wait on the forum when connecting and for each read
+        """
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_dir = Path(cache_dir)
+        
+        # All parsers share one session so connections to a forum are reused
+        if DiscourseParser._session is None:
+            DiscourseParser._session = self._create_session()
+        self.session = DiscourseParser._session
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """Create an HTTP session with a sized connection pool and retries"""
+        session = requests.Session()
+        session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        
+        # Retry rate limits and transient server errors with backoff
+        retries = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retries)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
 
     def fetch_topic(self, base_url: str, topic_id: str) -> Dict[str, Any]:
         """
@@ -23,16 +83,44 @@ class DiscourseParser:
             dict: Topic data
         """
         api_url = f"{base_url}/t/{topic_id}.json"
-        response = self.session.get(api_url)
+        
+        # Serve repeat fetches of the same topic from the disk cache
+        cache_path = None
+        if self.cache_ttl > 0:
+            key = hashlib.blake2b(f"{base_url}/{topic_id}".encode()).hexdigest()
+            cache_path = self.cache_dir / f"{key}.json"
+            try:
+                if cache_path.stat().st_mtime > time.time() - self.cache_ttl:
+                    return orjson.loads(cache_path.read_bytes())
+            except (OSError, orjson.JSONDecodeError):
+                pass
+        
+        response = self.session.get(api_url, timeout=self.timeout)
         response.raise_for_status()
-        return response.json()
+        topic_data = orjson.loads(response.content)
+        
+        if cache_path is not None:
+            # Write to a temporary file first so readers never see a partial entry
+            tmp_path = cache_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path.write_bytes(response.content)
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                # Caching is best-effort, the fetched topic is still returned
+                logger.warning(f"Could not write topic cache {cache_path}: {e}")
+                if tmp_path.exists():
+                    tmp_path.unlink()
+        
+        return topic_data
 
-    def extract_proposal_details(self, topic_data: Dict[str, Any]) -> Dict[str, Any]:
+    def extract_proposal_details(self, topic_data: Dict[str, Any], max_comments: Optional[int] = None) -> ProposalDetails:
         """
         Extract relevant details from the topic data.
         
         Args:
             topic_data: Raw topic data from the API
+            max_comments: Maximum number of comments to extract, all of them when None
             
         Returns:
             dict: Extracted proposal details
@@ -48,15 +136,16 @@ class DiscourseParser:
         if posts:
             main_content = clean_html_content(posts[0].get('cooked', ''))
         
-        # Extract and clean comments
-        comments = []
-        for post in posts[1:]:  # Skip the first post (main content)
-            comment = {
+        # Extract and clean comments, skipping the first post (main content)
+        comments_end = None if max_comments is None else 1 + max_comments
+        comments: List[Comment] = [
+            {
                 'content': clean_html_content(post.get('cooked', '')),
                 'created_at': post.get('created_at', ''),
                 'username': post.get('username', '')
             }
-            comments.append(comment)
+            for post in islice(posts, 1, comments_end)
+        ]
         
         return {
             'title': title,
@@ -65,24 +154,66 @@ class DiscourseParser:
             'comments': comments
         }
 
-    def parse_proposal(self, url: str) -> Dict[str, Any]:
+    def split_proposal_url(self, url: str) -> Tuple[str, str]:
         """
-        Parse a proposal from a Discourse forum URL.
+        Split a Discourse proposal URL into its base URL and topic ID.
         
         Args:
             url: URL of the proposal
             
         Returns:
-            dict: Parsed proposal details
+            tuple: Base URL of the forum and the topic ID
         """
-        # Extract base URL and topic ID from the URL
         parts = url.split('/t/')
         if len(parts) != 2:
             raise ValueError("Invalid proposal URL format")
             
         base_url = parts[0]
         topic_id = parts[1].split('/')[0]
+        return base_url, topic_id
+
+    def parse_proposal(self, url: str, max_comments: Optional[int] = None) -> ProposalDetails:
+        """
+        Parse a proposal from a Discourse forum URL.
+        
+        Args:
+            url: URL of the proposal
+            max_comments: Maximum number of comments to extract, all of them when None
+            
+        Returns:
+            dict: Parsed proposal details
+        """
+        # Extract base URL and topic ID from the URL
+        base_url, topic_id = self.split_proposal_url(url)
         
         # Fetch and parse the proposal
         topic_data = self.fetch_topic(base_url, topic_id)
-        return self.extract_proposal_details(topic_data) 
\ No newline at end of file
+        return self.extract_proposal_details(topic_data, max_comments)
+
+    def parse_proposals(self, urls: List[str], max_workers: int = 8, max_comments: Optional[int] = None) -> List[Any]:
+        """
+        Parse several proposals concurrently.
+        
+        Fetching is network-bound, so the requests share this parser's session
+        and run on a thread pool to overlap their round-trips.
+        
+        Args:
+            urls: URLs of the proposals
+            max_workers: Maximum number of concurrent fetches
+            max_comments: Maximum number of comments to extract per proposal, all of them when None
+            
+        Returns:
+            list: Parsed proposal details in the same order as `urls`. A URL that
+                  failed to fetch or parse yields the raised exception instead.
+        """
+        if not urls:
+            return []
+            
+        def parse_or_error(url: str) -> Any:
+            try:
+                return self.parse_proposal(url, max_comments)
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+            return list(executor.map(parse_or_error, urls)) 
\ No newline at end of file
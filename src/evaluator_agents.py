@@ -1,17 +1,78 @@
-import anthropic
-from typing import Dict, Any
-import os
-from dotenv import load_dotenv
-import json
+from typing import Dict, Any, List, Optional, Tuple
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .claude_client import ClaudeClient
+from .llm_cache import LLMCache
+from .text_utils import extract_tool_input
+
+# Tool Claude is required to call with its evaluation, so the reply is always structured
+EVALUATION_TOOL = {
+    "name": "submit_evaluation",
+    "description": "Submit the structured evaluation of the proposal.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "score": {
+                "type": "number",
+                "description": "Score between 0.00 and 1.00"
+            },
+            "reasoning": {
+                "type": "string",
+                "description": "Detailed explanation of the score"
+            },
+            "key_findings": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "aspect": {"type": "string", "description": "Specific aspect analyzed"},
+                        "analysis": {"type": "string", "description": "Detailed analysis of this aspect"},
+                        "impact": {"type": "string", "description": "Impact assessment"}
+                    },
+                    "required": ["aspect", "analysis", "impact"]
+                }
+            },
+            "information_gaps": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Critical information gaps"
+            },
+            "recommendations": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Specific recommendations"
+            }
+        },
+        "required": ["score", "reasoning", "key_findings", "information_gaps", "recommendations"]
+    }
+}
+
+# Instruction appended to every evaluation prompt
+OUTPUT_FORMAT = """
+
+Provide your analysis by calling the submit_evaluation tool."""
 
 class EvaluatorAgent:
-    def __init__(self):
-        """Initialize the evaluator agent with Claude API setup"""
-        load_dotenv()
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(self, cache_size: int = 128, cache_ttl: int = 86400, cache_dir: str = '.cache/llm'):
+        """
+        Initialize the evaluator agent with Claude API setup.
+        
+        Args:
+            cache_size: Number of recent evaluations kept in memory, 0 disables caching
+            cache_ttl: Seconds an evaluation is served from the disk cache, 0 disables it
+            cache_dir: Directory holding the cached evaluations
+        """
+        self.client = ClaudeClient.get_instance().client
+        self.model = "claude-3-5-sonnet-20241022"
+        self.temperature = 0.1
+        
+        # Least recently used evaluations keyed by request digest, backed by the disk cache
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.disk_cache = LLMCache(cache_dir, cache_ttl)
         
         # Category-specific prompts
         self.prompts = {
@@ -128,24 +189,52 @@ class EvaluatorAgent:
                 ]
             }
         }
+        
+        # The category prompts are static, so render everything before the proposal once
+        self.prompt_prefixes = {
+            category: self._render_prompt_prefix(prompt)
+            for category, prompt in self.prompts.items()
+        }
 
-    def evaluate_proposal(self, category: str, proposal_details: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def _render_prompt_prefix(prompt: Dict[str, Any]) -> str:
         """
-        Evaluate a proposal using the appropriate category-specific evaluator.
+        Render the part of an evaluation prompt that precedes the proposal text.
         
         Args:
-            category: The primary category of the proposal
+            prompt: Category prompt with system, key_points and output_instructions
+            
+        Returns:
+            str: Prompt prefix for the category
+        """
+        key_points = "\n".join(f"- {point}" for point in prompt['key_points'])
+        output_instructions = "\n".join(f"- {instruction}" for instruction in prompt['output_instructions'])
+        return f"""{prompt['system']}
+
+Key Analysis Points:
+{key_points}
+
+Output Instructions:
+{output_instructions}
+
+Please analyze the following proposal:
+
+"""
+
+    def _build_prompt(self, category: str, proposal_details: Dict[str, Any]) -> str:
+        """
+        Build the proposal-specific part of an evaluation prompt.
+        
+        Args:
+            category: The category evaluator to use
             proposal_details: Dictionary containing proposal details
             
         Returns:
-            dict: Evaluation results including score, analysis, and structured findings
+            str: Proposal text followed by the output format, sent after the category prefix
         """
         if category not in self.prompts:
             raise ValueError(f"Unknown category: {category}")
             
-        # Get the category-specific prompt
-        prompt = self.prompts[category]
-        
         # Format the proposal text
         proposal_text = f"""
 Title: {proposal_details['title']}
@@ -153,74 +242,220 @@ Title: {proposal_details['title']}
 Content:
 {proposal_details['content']}"""
             
-        # Create the full prompt with structured output format
-        full_prompt = f"""{prompt['system']}
+        # Follow the proposal with the structured output format
+        return f"{proposal_text}{OUTPUT_FORMAT}"
 
-Key Analysis Points:
-{chr(10).join(f"- {point}" for point in prompt['key_points'])}
+    def _get_cached(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a cached evaluation, or None if it is not cached"""
+        with self._cache_lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return dict(self._cache[cache_key])
+        
+        # Fall back to evaluations saved by earlier runs
+        result = self.disk_cache.get(cache_key)
+        if result is not None:
+            self._remember(cache_key, result)
+            return dict(result)
+        return None
 
-Output Instructions:
-{chr(10).join(f"- {instruction}" for instruction in prompt['output_instructions'])}
+    def _remember(self, cache_key: str, result: Dict[str, Any]) -> None:
+        """Keep an evaluation in memory, evicting the least recently used one when full"""
+        if self.cache_size > 0:
+            with self._cache_lock:
+                self._cache[cache_key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
 
-Please analyze the following proposal:
+    def _store_cached(self, cache_key: str, result: Dict[str, Any]) -> None:
+        """Cache an evaluation in memory and on disk"""
+        self._remember(cache_key, result)
+        self.disk_cache.set(cache_key, result)
+
+    def _cache_key(self, category: str, prompt: str) -> str:
+        return LLMCache.make_key(self.model, self.temperature, EVALUATION_TOOL, category,
+                                 self.prompt_prefixes[category], prompt)
 
-{proposal_text}
-
-Provide your analysis in the following JSON format:
-{{
-    "score": <float between 0.00 and 1.00>,
-    "reasoning": "<detailed explanation of the score>",
-    "key_findings": [
-        {{
-            "aspect": "<specific aspect analyzed>",
-            "analysis": "<detailed analysis of this aspect>",
-            "impact": "<impact assessment>"
-        }}
-    ],
-    "information_gaps": [
-        "<list of critical information gaps>"
-    ],
-    "recommendations": [
-        "<list of specific recommendations>"
-    ]
-}}"""
+    @staticmethod
+    def _error_result(error: Any) -> Dict[str, Any]:
+        print(f"Error evaluating proposal: {str(error)}")
+        return {
+            "score": 0.0,
+            "reasoning": f"Error evaluating proposal: {str(error)}",
+            "key_findings": [],
+            "information_gaps": [],
+            "recommendations": []
+        }
+
+    def _request_params(self, category: str, prompt: str) -> Dict[str, Any]:
+        """Message parameters shared by single and batched evaluations"""
+        return {
+            "model": self.model,
+            "max_tokens": 1500,
+            "temperature": self.temperature,
+            "tools": [EVALUATION_TOOL],
+            "tool_choice": {"type": "tool", "name": EVALUATION_TOOL['name']},
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        # The category prefix is identical across proposals, so let the API cache it
+                        {
+                            "type": "text",
+                            "text": self.prompt_prefixes[category],
+                            "cache_control": {"type": "ephemeral"}
+                        },
+                        {
+                            "type": "text",
+                            "text": prompt
+                        }
+                    ]
+                }
+            ]
+        }
+
+    def evaluate_proposal(self, category: str, proposal_details: Dict[str, Any],
+                          bypass_cache: bool = False) -> Dict[str, Any]:
+        """
+        Evaluate a proposal using the appropriate category-specific evaluator.
+        
+        Args:
+            category: The primary category of the proposal
+            proposal_details: Dictionary containing proposal details
+            bypass_cache: Ignore cached evaluations and request a fresh one
+            
+        Returns:
+            dict: Evaluation results including score, analysis, and structured findings
+        """
+        prompt = self._build_prompt(category, proposal_details)
+        
+        # Reuse the evaluation if the same proposal was recently evaluated for this category
+        cache_key = self._cache_key(category, prompt)
+        cached = None if bypass_cache else self._get_cached(cache_key)
+        if cached is not None:
+            return cached
         
         try:
-            # Get Claude's analysis
-            message = self.client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=1500,
-                temperature=0.1,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": full_prompt
-                    }
-                ]
-            )
+            # Get Claude's analysis as the input of the evaluation tool call
+            message = self.client.messages.create(**self._request_params(category, prompt))
+            result = extract_tool_input(message, EVALUATION_TOOL)
             
-            # Extract the response content
-            response_text = message.content[0].text
+            # Add category information to the result
+            result['category'] = category
             
-            # Find the JSON block in the response
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                result = json.loads(response_text[json_start:json_end])
-                
-                # Add category information to the result
-                result['category'] = category
-                
-                return result
-            else:
-                raise ValueError("No valid JSON found in response")
+            self._store_cached(cache_key, result)
+            return dict(result)
             
         except Exception as e:
-            print(f"Error evaluating proposal: {str(e)}")
-            return {
-                "score": 0.0,
-                "reasoning": f"Error evaluating proposal: {str(e)}",
-                "key_findings": [],
-                "information_gaps": [],
-                "recommendations": []
-            } 
\ No newline at end of file
+            return self._error_result(e)
+
+    def evaluate_batch(self, proposals: List[Tuple[str, Dict[str, Any]]],
+                       poll_interval: float = 30.0, bypass_cache: bool = False) -> List[Dict[str, Any]]:
+        """
+        Evaluate many proposals through the Message Batches API.
+        
+        Batches are billed at half the price of individual requests but can take
+        minutes to hours to complete, so this is meant for offline evaluation runs.
+        
+        Args:
+            proposals: (category, proposal_details) pairs to evaluate
+            poll_interval: Seconds to wait between checks on the batch status
+            bypass_cache: Ignore cached evaluations and request fresh ones
+            
+        Returns:
+            list: Evaluation results in the same order as `proposals`
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(proposals)
+        cache_keys = {}
+        requests = []
+        for idx, (category, proposal_details) in enumerate(proposals):
+            prompt = self._build_prompt(category, proposal_details)
+            cache_key = self._cache_key(category, prompt)
+            cached = None if bypass_cache else self._get_cached(cache_key)
+            if cached is not None:
+                results[idx] = cached
+                continue
+            cache_keys[idx] = cache_key
+            # Batch custom_ids may only contain letters, digits, underscores and hyphens
+            requests.append({"custom_id": str(idx), "params": self._request_params(category, prompt)})
+        
+        if requests:
+            try:
+                batch = self.client.messages.batches.create(requests=requests)
+                while batch.processing_status != 'ended':
+                    time.sleep(poll_interval)
+                    batch = self.client.messages.batches.retrieve(batch.id)
+                
+                # Results are not returned in request order, so match them by custom_id
+                for entry in self.client.messages.batches.results(batch.id):
+                    idx = int(entry.custom_id)
+                    if entry.result.type != 'succeeded':
+                        results[idx] = self._error_result(f"batch request {entry.result.type}")
+                        continue
+                    try:
+                        result = extract_tool_input(entry.result.message, EVALUATION_TOOL)
+                        result['category'] = proposals[idx][0]
+                        self._store_cached(cache_keys[idx], result)
+                        results[idx] = dict(result)
+                    except Exception as e:
+                        results[idx] = self._error_result(e)
+            except Exception as e:
+                error_result = self._error_result(e)
+                results = [result if result is not None else dict(error_result) for result in results]
+        
+        # Requests missing from the batch results are reported as errors
+        return [
+            result if result is not None else self._error_result("no result returned for batch request")
+            for result in results
+        ]
+
+    def evaluate_all(self, proposal_details: Dict[str, Any], categories: Optional[List[str]] = None,
+                     max_workers: int = 4) -> Dict[str, Dict[str, Any]]:
+        """
+        Evaluate a proposal with several category evaluators concurrently.
+        
+        Args:
+            proposal_details: Dictionary containing proposal details
+            categories: Categories to evaluate, defaults to all of them
+            max_workers: Maximum number of evaluation requests in flight at once
+            
+        Returns:
+            dict: Evaluation results keyed by category
+        """
+        if categories is None:
+            categories = list(self.prompts)
+        if not categories:
+            return {}
+            
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(categories))) as executor:
+            results = executor.map(
+                lambda category: self.evaluate_proposal(category, proposal_details), categories
+            )
+            return dict(zip(categories, results))
+
+    def evaluate_all_categories(self, proposal_details: Dict[str, Any], weights: Dict[str, float],
+                                min_weight: float = 0.05, max_workers: int = 4) -> Dict[str, Any]:
+        """
+        Evaluate a proposal with every category evaluator its weights call for.
+        
+        Args:
+            proposal_details: Dictionary containing proposal details
+            weights: Category weights from the proposal analyzer
+            min_weight: Categories weighted at or below this are not evaluated
+            max_workers: Maximum number of evaluation requests in flight at once
+            
+        Returns:
+            dict: Weighted score across the evaluated categories and the evaluations keyed by category
+        """
+        categories = [c for c, weight in weights.items() if weight > min_weight and c in self.prompts]
+        evaluations = self.evaluate_all(proposal_details, categories, max_workers)
+        
+        # Combine the category scores, weighting each by its share of the evaluated weight
+        total_weight = sum(weights[c] for c in categories)
+        weighted_score = sum(weights[c] * evaluations[c].get('score', 0.0) for c in categories)
+        score = weighted_score / total_weight if total_weight else 0.0
+        
+        return {
+            "score": score,
+            "evaluations": evaluations
+        }
\ No newline at end of file
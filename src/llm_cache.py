@@ -0,0 +1,79 @@
+import os
+import time
+import logging
+import hashlib
+import threading
+import orjson
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    def __init__(self, cache_dir: str = '.cache/llm', ttl: int = 86400):
+        """
+        Initialize a disk cache for parsed model responses.
+        
+        Args:
+            cache_dir: Directory holding the cached responses
+            ttl: Seconds a cached response stays valid, 0 disables the cache
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        Build a cache key from everything that determines a response.
+        
+        Args:
+            parts: Model, sampling settings and prompt text of the request
+            
+        Returns:
+            str: Hex digest identifying the request
+        """
+        return hashlib.blake2b('\x1f'.join(map(str, parts)).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Key built with make_key
+            
+        Returns:
+            dict: The cached result, or None if it is missing or expired
+        """
+        if self.ttl <= 0:
+            return None
+        cache_path = self.cache_dir / f"{key}.json"
+        try:
+            if cache_path.stat().st_mtime > time.time() - self.ttl:
+                return orjson.loads(cache_path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            pass
+        return None
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store a parsed response.
+        
+        Args:
+            key: Key built with make_key
+            result: Parsed result to cache
+        """
+        if self.ttl <= 0:
+            return
+        cache_path = self.cache_dir / f"{key}.json"
+        
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = cache_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(orjson.dumps(result))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            # Caching is best-effort, the result is still returned to the caller
+            logger.warning(f"Could not write cache entry {cache_path}: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
\ No newline at end of file
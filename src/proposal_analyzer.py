@@ -1,12 +1,68 @@
-import json
 from typing import Dict, Any, Optional
 from .claude_client import ClaudeClient
-from .text_utils import prepare_proposal_text
+from .llm_cache import LLMCache
+from .similarity_cache import SimilarityCache
+from .text_utils import prepare_proposal_text, extract_tool_input
+
+# Category keys, in the order they appear in the scoring prompt
+CATEGORIES = (
+    "protocol_parameters",
+    "treasury_management",
+    "tokenomics",
+    "protocol_upgrades",
+    "governance_process",
+    "partnerships_integrations",
+    "risk_management",
+    "community_initiatives",
+)
+
+# Tool Claude is required to call with its analysis, so the reply is always structured
+ANALYSIS_TOOL = {
+    "name": "submit_analysis",
+    "description": "Submit the category weights and summary of the proposal.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            **{c: {"type": "number", "description": "Weight between 0 and 1"} for c in CATEGORIES},
+            "sum": {"type": "number", "description": "Total of all category weights"},
+            "primary_category": {
+                "type": "string",
+                "enum": list(CATEGORIES),
+                "description": "Category with the highest weight"
+            },
+            "summary": {"type": "string", "description": "Brief summary of the proposal"}
+        },
+        "required": [*CATEGORIES, "sum", "primary_category", "summary"]
+    }
+}
+
+# Instruction appended to every analysis prompt
+OUTPUT_FORMAT = """
+
+Provide the analysis by calling the submit_analysis tool. Make sure all scores are between 0 and 1, and the sum equals exactly 1.0."""
 
 class ProposalAnalyzer:
-    def __init__(self):
-        """Initialize the proposal analyzer with Claude API setup"""
+    def __init__(self, model: str = "claude-3-5-haiku-20241022", cache_ttl: int = 86400,
+                 cache_dir: str = '.cache/llm', similarity_threshold: Optional[float] = 0.9):
+        """
+        Initialize the proposal analyzer with Claude API setup.
+        
+        Args:
+            model: Claude model used to categorize proposals
+            cache_ttl: Seconds an analysis is served from the disk and near-duplicate caches, 0 disables them
+            cache_dir: Directory holding the cached analyses
+            similarity_threshold: Shingle similarity at which a near-duplicate proposal reuses
+                                  a cached analysis, None disables matching near-duplicates
+        """
         self.client = ClaudeClient.get_instance().client
+        self.model = model
+        self.temperature = 0
+        self.cache = LLMCache(cache_dir, cache_ttl)
+        self.similarity_cache = None
+        if similarity_threshold is not None and cache_ttl > 0:
+            self.similarity_cache = SimilarityCache(
+                f"{cache_dir}/similar_proposals.json", similarity_threshold, cache_ttl
+            )
         
         # Load the scoring system prompt
         self.base_prompt = """You are an expert DAO governance delegate that has been tasked with analyzing a proposal. Analyze this proposal and:
@@ -33,12 +89,13 @@ Scoring Guidelines:
 Proposal to analyze:
 """
 
-    def analyze_proposal(self, proposal_details: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_proposal(self, proposal_details: Dict[str, Any], bypass_cache: bool = False) -> Dict[str, Any]:
         """
         Analyze a proposal using Claude and return the categorized scores.
         
         Args:
             proposal_details: Dictionary containing proposal details
+            bypass_cache: Ignore a cached analysis and request a fresh one
             
         Returns:
             dict: Analysis results with scores and summary
@@ -46,66 +103,74 @@ Proposal to analyze:
         # Prepare the proposal text using shared utility
         proposal_text = prepare_proposal_text(proposal_details)
         
-        # Create the full prompt
-        full_prompt = f"{self.base_prompt}{proposal_text}\n\nPlease provide the analysis in the following JSON format:\n{{\n    \"protocol_parameters\": <score>,\n    \"treasury_management\": <score>,\n    \"tokenomics\": <score>,\n    \"protocol_upgrades\": <score>,\n    \"governance_process\": <score>,\n    \"partnerships_integrations\": <score>,\n    \"risk_management\": <score>,\n    \"community_initiatives\": <score>,\n    \"sum\": <total of all scores>,\n    \"primary_category\": \"<category with highest score>\",\n    \"summary\": \"<brief summary of the proposal>\"\n}}\n\nMake sure all scores are between 0 and 1, and the sum equals exactly 1.0."
+        # Follow the proposal with the expected output format
+        prompt = f"{proposal_text}{OUTPUT_FORMAT}"
+        
+        # Reuse the analysis of an identical request from an earlier run, or of a near-duplicate proposal
+        cache_key = LLMCache.make_key(self.model, self.temperature, ANALYSIS_TOOL, self.base_prompt, prompt)
+        namespace = LLMCache.make_key(self.model, self.temperature, ANALYSIS_TOOL, self.base_prompt)
+        if not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is None and self.similarity_cache is not None:
+                cached = self.similarity_cache.get(namespace, proposal_text)
+            if cached is not None:
+                return cached
         
         try:
-            # Get Claude's analysis using the latest API
+            # Get Claude's analysis as the input of the analysis tool call
             message = self.client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=1500,
-                temperature=0,
+                model=self.model,
+                max_tokens=800,
+                temperature=self.temperature,
+                tools=[ANALYSIS_TOOL],
+                tool_choice={"type": "tool", "name": ANALYSIS_TOOL['name']},
                 messages=[
                     {
                         "role": "user",
-                        "content": full_prompt
+                        "content": [
+                            # The scoring instructions never change, so let the API cache them
+                            {
+                                "type": "text",
+                                "text": self.base_prompt,
+                                "cache_control": {"type": "ephemeral"}
+                            },
+                            {
+                                "type": "text",
+                                "text": prompt
+                            }
+                        ]
                     }
                 ]
             )
+            result = extract_tool_input(message, ANALYSIS_TOOL)
+            
+            # Extract category scores
+            category_weights = {c: float(result.get(c, 0.0)) for c in CATEGORIES}
+            
+            # Calculate total score
+            total_score = sum(category_weights.values())
+            
+            # Normalize scores if total is not 1.0
+            if abs(total_score - 1.0) > 0.0001:  # Allow for small floating point differences
+                print(f"Warning: Category scores sum to {total_score:.2f}, normalizing to 1.0")
+                category_weights = {c: weight / total_score for c, weight in category_weights.items()}
+                result['sum'] = 1.0
+            
+            # Update result with the final scores
+            result.update(category_weights)
             
-            # Extract the response content
-            response_text = message.content[0].text
+            # The primary category is the highest weighted one
+            result['primary_category'] = max(CATEGORIES, key=category_weights.__getitem__)
             
-            # Find the JSON block in the response
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                result = json.loads(response_text[json_start:json_end])
-                
-                # Extract category scores
-                category_weights = {
-                    k: v for k, v in result.items() 
-                    if k not in ['sum', 'primary_category', 'summary']
-                }
-                
-                # Calculate total score
-                total_score = sum(category_weights.values())
-                
-                # Normalize scores if total is not 1.0
-                if abs(total_score - 1.0) > 0.0001:  # Allow for small floating point differences
-                    print(f"Warning: Category scores sum to {total_score:.2f}, normalizing to 1.0")
-                    for category in category_weights:
-                        category_weights[category] = category_weights[category] / total_score
-                    
-                    # Update result with normalized scores
-                    result.update(category_weights)
-                    result['sum'] = 1.0
-                
-                return result
-            else:
-                raise ValueError("No valid JSON found in response")
+            self.cache.set(cache_key, result)
+            if self.similarity_cache is not None:
+                self.similarity_cache.add(namespace, proposal_text, result)
+            return result
             
         except Exception as e:
             print(f"Error analyzing proposal: {str(e)}")
             return {
-                "protocol_parameters": 0.00,
-                "treasury_management": 0.00,
-                "tokenomics": 0.00,
-                "protocol_upgrades": 0.00,
-                "governance_process": 0.00,
-                "partnerships_integrations": 0.00,
-                "risk_management": 0.00,
-                "community_initiatives": 0.00,
+                **{c: 0.00 for c in CATEGORIES},
                 "sum": 0.00,
                 "primary_category": "error",
                 "summary": f"Error analyzing proposal: {str(e)}"
@@ -0,0 +1,73 @@
+from typing import Dict, Any
+from .claude_client import ClaudeClient
+from .llm_cache import LLMCache
+
+# Roughly 8k tokens, beyond which proposal content is condensed before analysis
+MAX_CONTENT_CHARS = 32000
+
+CONDENSE_PROMPT = """Condense the following DAO governance proposal to at most about 1,000 words. Keep every concrete detail a reviewer needs: parameters with their current and proposed values, amounts and recipients, timelines, technical changes, risks and mitigations. Drop repetition, background that does not affect the decision, and boilerplate. Reply with the condensed proposal text only.
+
+Proposal:
+"""
+
+class ProposalCondenser:
+    def __init__(self, model: str = "claude-3-5-haiku-20241022", max_chars: int = MAX_CONTENT_CHARS,
+                 cache_ttl: int = 86400, cache_dir: str = '.cache/llm'):
+        """
+        Initialize the proposal condenser with Claude API setup.
+        
+        Args:
+            model: Claude model used to condense long proposals
+            max_chars: Proposal content longer than this is condensed
+            cache_ttl: Seconds a condensed proposal is served from the disk cache, 0 disables it
+            cache_dir: Directory holding the cached condensed proposals
+        """
+        self.client = ClaudeClient.get_instance().client
+        self.model = model
+        self.max_chars = max_chars
+        self.cache = LLMCache(cache_dir, cache_ttl)
+
+    def condense(self, proposal_details: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Condense the content of a long proposal so later prompts stay small.
+        
+        Args:
+            proposal_details: Dictionary containing proposal details
+            
+        Returns:
+            dict: The proposal details, with the content condensed if it was too long
+        """
+        content = proposal_details['content']
+        if len(content) <= self.max_chars:
+            return proposal_details
+        
+        cache_key = LLMCache.make_key(self.model, CONDENSE_PROMPT, content)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return {**proposal_details, 'content': cached['content']}
+        
+        try:
+            message = self.client.messages.create(
+                model=self.model,
+                # About twice the tokens of the requested length, leaving room for a complete reply
+                max_tokens=3000,
+                temperature=0,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": f"{CONDENSE_PROMPT}{content}"
+                    }
+                ]
+            )
+            # A reply cut off at max_tokens would drop part of the proposal, so it is never used
+            if message.stop_reason == 'max_tokens':
+                raise ValueError("condensed proposal was cut off at max_tokens")
+            
+            condensed = message.content[0].text.strip()
+            self.cache.set(cache_key, {'content': condensed})
+            return {**proposal_details, 'content': condensed}
+        
+        except Exception as e:
+            # Fall back to the full content rather than failing the analysis
+            print(f"Error condensing proposal: {str(e)}")
+            return proposal_details
\ No newline at end of file
@@ -1,36 +1,54 @@
-import os
-from typing import List, Dict, Any
-from dotenv import load_dotenv
-import anthropic
-from datetime import datetime
+import statistics
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
 from .claude_client import ClaudeClient
-import json
+from .llm_cache import LLMCache
+from .similarity_cache import SimilarityCache
+from .text_utils import extract_json_stream, unique_points
 
 class SentimentAnalyzer:
-    def __init__(self, batch_size: int = 10):
-        """Initialize the sentiment analyzer with Claude API setup"""
-        load_dotenv()
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY not found in environment variables")
+    def __init__(self, batch_size: int = 10, max_workers: int = 8, cache_ttl: int = 86400,
+                 cache_dir: str = '.cache/llm', similarity_threshold: Optional[float] = 0.9):
+        """
+        Initialize the sentiment analyzer with Claude API setup.
+        
+        Args:
+            batch_size: Number of comments sent to Claude per request
+            max_workers: Maximum number of batch requests in flight at once
+            cache_ttl: Seconds a batch analysis is served from the disk and near-duplicate caches, 0 disables them
+            cache_dir: Directory holding the cached batch analyses
+            similarity_threshold: Shingle similarity at which a near-duplicate batch of comments reuses
+                                  a cached analysis, None disables matching near-duplicates
+        """
         self.client = ClaudeClient.get_instance().client
+        self.model = "claude-3-sonnet-20240229"
+        self.temperature = 0
         self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.cache = LLMCache(cache_dir, cache_ttl)
+        self.similarity_cache = None
+        if similarity_threshold is not None and cache_ttl > 0:
+            self.similarity_cache = SimilarityCache(
+                f"{cache_dir}/similar_comments.json", similarity_threshold, cache_ttl
+            )
         
-    def analyze_comment_batch(self, comments: List[Dict[str, Any]], proposal_summary: str) -> Dict[str, Any]:
+    def analyze_comment_batch(self, comments: List[Dict[str, Any]], proposal_summary: str,
+                              bypass_cache: bool = False) -> Dict[str, Any]:
         """
         Analyze a batch of comments using Claude.
         
         Args:
             comments: List of comment dictionaries
             proposal_summary: Summary of the proposal for context
+            bypass_cache: Ignore a cached analysis and request a fresh one
             
         Returns:
             dict: Analysis results for the batch
         """
         # Format comments for Claude
         formatted_comments = "\n\n".join([
-            f"Comment {i+1}:\n{comment['content']}"
-            for i, comment in enumerate(comments)
+            f"Comment {i}:\n{comment['content']}"
+            for i, comment in enumerate(comments, 1)
         ])
         
         prompt = f"""You are analyzing comments on a DAO governance proposal. Here is the proposal summary for context:
@@ -59,27 +77,35 @@ Make sure to:
 6. Consider the overall sentiment in relation to the proposal's goals
 """
 
+        # Reuse the analysis of an identical batch from an earlier run, or of near-duplicate
+        # comments on the same proposal
+        cache_key = LLMCache.make_key(self.model, self.temperature, prompt)
+        namespace = LLMCache.make_key(self.model, self.temperature, proposal_summary)
+        if not bypass_cache:
+            cached = self.cache.get(cache_key)
+            if cached is None and self.similarity_cache is not None:
+                cached = self.similarity_cache.get(namespace, formatted_comments)
+            if cached is not None:
+                return cached
+        
         try:
-            message = self.client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=1500,
-                temperature=0,
+            # Stream the analysis and stop reading once the JSON block is complete
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=1024,
+                temperature=self.temperature,
                 messages=[
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ]
-            )
-            
-            response_text = message.content[0].text
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                return json.loads(response_text[json_start:json_end])
-            else:
-                raise ValueError("No valid JSON found in response")
+            ) as stream:
+                result = extract_json_stream(stream.text_stream)
+            self.cache.set(cache_key, result)
+            if self.similarity_cache is not None:
+                self.similarity_cache.add(namespace, formatted_comments, result)
+            return result
                 
         except Exception as e:
             print(f"Error analyzing comment batch: {str(e)}")
@@ -91,13 +117,15 @@ Make sure to:
                 'suggestions': []
             }
 
-    def analyze_all_comments(self, comments: List[Dict[str, Any]], proposal_summary: str) -> Dict[str, Any]:
+    def analyze_all_comments(self, comments: List[Dict[str, Any]], proposal_summary: str,
+                             bypass_cache: bool = False) -> Dict[str, Any]:
         """
         Analyze all comments in batches and aggregate results.
         
         Args:
             comments: List of comment dictionaries
             proposal_summary: Summary of the proposal for context
+            bypass_cache: Ignore cached batch analyses and request fresh ones
             
         Returns:
             dict: Aggregated analysis results
@@ -105,6 +133,7 @@ Make sure to:
         if not comments:
             return {
                 'sentiment_score': 0.0,
+                'sentiment_std': 0.0,
                 'summary': "No comments to analyze",
                 'key_points': [],
                 'concerns': [],
@@ -112,26 +141,28 @@ Make sure to:
                 'num_comments': 0
             }
         
-        # Process comments in batches
-        batch_results = []
-        for i in range(0, len(comments), self.batch_size):
-            batch = comments[i:i + self.batch_size]
-            result = self.analyze_comment_batch(batch, proposal_summary)
-            batch_results.append(result)
+        # Process comments in batches, the requests are independent so run them concurrently
+        batches = [comments[i:i + self.batch_size] for i in range(0, len(comments), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            batch_results = list(executor.map(
+                lambda batch: self.analyze_comment_batch(batch, proposal_summary, bypass_cache), batches
+            ))
         
         # Aggregate results
         if not batch_results:
             return {
                 'sentiment_score': 0.0,
+                'sentiment_std': 0.0,
                 'summary': "No valid analysis results",
                 'key_points': [],
                 'concerns': [],
                 'suggestions': []
             }
         
-        # Calculate average sentiment score
-        sentiment_scores = [r.get('sentiment_score', 0.0) for r in batch_results]
-        avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
+        # Average the sentiment scores weighted by the comments in each batch, the last batch can be smaller
+        sentiment_scores = [float(r.get('sentiment_score', 0.0)) for r in batch_results]
+        avg_sentiment = sum(score * len(batch) for score, batch in zip(sentiment_scores, batches)) / len(comments)
+        sentiment_std = statistics.pstdev(sentiment_scores)
         
         # Combine summaries
         combined_summary = " ".join([r.get('summary', '') for r in batch_results])
@@ -146,13 +177,14 @@ Make sure to:
             all_concerns.extend(result.get('concerns', []))
             all_suggestions.extend(result.get('suggestions', []))
         
-        # Remove duplicates while preserving order
-        all_key_points = list(dict.fromkeys(all_key_points))
-        all_concerns = list(dict.fromkeys(all_concerns))
-        all_suggestions = list(dict.fromkeys(all_suggestions))
+        # Remove duplicates while preserving order, including rewordings that only differ in case or punctuation
+        all_key_points = unique_points(all_key_points)
+        all_concerns = unique_points(all_concerns)
+        all_suggestions = unique_points(all_suggestions)
         
         return {
             'sentiment_score': avg_sentiment,
+            'sentiment_std': sentiment_std,
             'summary': combined_summary,
             'key_points': all_key_points,
             'concerns': all_concerns,
@@ -0,0 +1,177 @@
+import os
+import re
+import time
+import zlib
+import atexit
+import logging
+import threading
+import orjson
+from pathlib import Path
+from typing import Dict, Any, List, Optional, FrozenSet
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\w+')
+
+def shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    """
+    Hash the overlapping word n-grams of a text.
+    
+    Args:
+        text: Text to shingle
+        size: Number of words per shingle
+        
+    Returns:
+        frozenset: CRC32 hashes of the shingles, stable across processes
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return frozenset([zlib.crc32(' '.join(words).encode())]) if words else frozenset()
+    return frozenset(
+        zlib.crc32(' '.join(words[i:i + size]).encode())
+        for i in range(len(words) - size + 1)
+    )
+
+class SimilarityCache:
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.9, ttl: int = 86400,
+                 max_entries: int = 1000):
+        """
+        Initialize a cache that matches near-duplicate texts.
+        
+        Texts are compared by the Jaccard similarity of their word shingles, so
+        re-posted or lightly edited proposals hit the result of the original.
+        
+        Args:
+            path: JSON file the entries are loaded from and saved to at exit, memory only when None
+            threshold: Minimum similarity between 0 and 1 for a cached result to be reused
+            ttl: Seconds an entry stays valid
+            max_entries: Number of most recent entries kept, older ones are dropped
+        """
+        self.path = Path(path) if path else None
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._dirty = False
+        
+        if self.path is not None:
+            try:
+                for entry in orjson.loads(self.path.read_bytes()):
+                    entry['shingles'] = frozenset(entry['shingles'])
+                    self._entries.append(entry)
+            except (OSError, orjson.JSONDecodeError, KeyError, TypeError):
+                self._entries = []
+            
+            # Entries written before timestamps were stored count as expired
+            with self._lock:
+                self._prune()
+            atexit.register(self.save)
+
+    def _prune(self) -> None:
+        """Drop expired entries and the oldest ones beyond max_entries, the lock must be held"""
+        cutoff = time.time() - self.ttl
+        entries = [entry for entry in self._entries if entry.get('created', 0) > cutoff]
+        entries = entries[max(0, len(entries) - self.max_entries):]
+        if len(entries) != len(self._entries):
+            self._entries = entries
+            self._dirty = True
+
+    def get(self, namespace: str, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the result cached for the most similar text.
+        
+        Args:
+            namespace: Key of the model and prompt the result must come from
+            text: Text to match
+            
+        Returns:
+            dict: Copy of the cached result, or None if no text is similar enough
+        """
+        query = shingles(text)
+        best_score = 0.0
+        best_result = None
+        if query:
+            with self._lock:
+                self._prune()
+                
+                # Entries are oldest first, so ties go to the most recent result
+                for entry in self._entries:
+                    if entry['namespace'] != namespace:
+                        continue
+                    
+                    # Jaccard similarity can never exceed the ratio of the set sizes
+                    candidate = entry['shingles']
+                    if min(len(query), len(candidate)) < self.threshold * max(len(query), len(candidate)):
+                        continue
+                    overlap = len(query & candidate)
+                    score = overlap / (len(query) + len(candidate) - overlap)
+                    if score >= best_score:
+                        best_score, best_result = score, entry['result']
+        
+        if best_result is not None and best_score >= self.threshold:
+            self.hits += 1
+            logger.debug(f"Similarity cache hit ({best_score:.3f}), {self.hits} hits / {self.misses} misses")
+            return dict(best_result)
+        self.misses += 1
+        logger.debug(f"Similarity cache miss, {self.hits} hits / {self.misses} misses")
+        return None
+
+    def add(self, namespace: str, text: str, result: Dict[str, Any]) -> None:
+        """
+        Cache the result for a text, replacing the results of texts it would match.
+        
+        Args:
+            namespace: Key of the model and prompt the result came from
+            text: Text the result was produced for
+            result: Result to cache
+        """
+        text_shingles = shingles(text)
+        if not text_shingles:
+            return
+        with self._lock:
+            # A fresh result, for instance one requested with the cache bypassed, supersedes the old ones
+            self._entries = [
+                entry for entry in self._entries
+                if entry['namespace'] != namespace or not self._matches(text_shingles, entry['shingles'])
+            ]
+            self._entries.append({
+                'namespace': namespace,
+                'shingles': text_shingles,
+                'result': result,
+                'created': time.time()
+            })
+            self._dirty = True
+            self._prune()
+
+    def _matches(self, query: FrozenSet[int], candidate: FrozenSet[int]) -> bool:
+        """Check whether two shingle sets are at least as similar as the threshold"""
+        if min(len(query), len(candidate)) < self.threshold * max(len(query), len(candidate)):
+            return False
+        overlap = len(query & candidate)
+        return overlap >= self.threshold * (len(query) + len(candidate) - overlap)
+
+    def save(self) -> None:
+        """Write the entries to the cache file if any were added"""
+        if self.path is None or not self._dirty:
+            return
+        with self._lock:
+            data = orjson.dumps([
+                {**entry, 'shingles': sorted(entry['shingles'])}
+                for entry in self._entries
+            ])
+            self._dirty = False
+        
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = self.path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # Runs at exit, so a failed write must not raise
+            logger.warning(f"Could not write similarity cache {self.path}: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink()
\ No newline at end of file
@@ -1,6 +1,40 @@
-from typing import Dict, Any, List
+import re
+import json
+import html
+import orjson
+from typing import Dict, Any, List, Iterable, Optional
+from selectolax.lexbor import LexborHTMLParser
 
-def prepare_proposal_text(proposal_details: Dict[str, Any], include_comments: bool = True, max_comments: int = 3) -> str:
+# Elements whose closing tag ends a line of text
+_BLOCK_SELECTOR = 'p, div, li, h1, h2, h3, h4, h5, h6'
+
+# Quoted replies and link previews repeat text from elsewhere, so they are dropped
+_DROPPED_SELECTOR = 'aside.quote, aside.onebox'
+
+# Characters the HTML parser would rewrite: tags, entities, carriage returns and NULs
+_MARKUP_RE = re.compile(r'[<&\r\x00]')
+
+# Below this many characters, simple markup is stripped with a regex instead of a full parse
+_SMALL_HTML_CHARS = 512
+
+# Paragraph, line break and inline tags whose text a regex strip reproduces exactly
+_SIMPLE_TAG_RE = re.compile(r'<(/?)(p|br|a|b|strong|em|i|span|code)((?:\s+[a-z-]+(?:="[^"<>]*")?)*)\s*/?>')
+
+# Number of comments quoted in analysis prompts
+PROMPT_MAX_COMMENTS = 3
+
+# Characters of comment text quoted in analysis prompts, shared between the comments (about 400 tokens)
+PROMPT_COMMENT_CHARS = 1500
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Punctuation around words and runs of whitespace ignored when comparing points from different batches,
+# punctuation inside a word such as a decimal point is kept
+_PUNCTUATION_RE = re.compile(r'(?<!\w)[^\w\s]+|[^\w\s]+(?!\w)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def prepare_proposal_text(proposal_details: Dict[str, Any], include_comments: bool = True, max_comments: int = PROMPT_MAX_COMMENTS,
+                          comment_chars: int = PROMPT_COMMENT_CHARS) -> str:
     """
     Prepare the proposal text for analysis by combining relevant fields.
     
@@ -8,6 +42,7 @@ def prepare_proposal_text(proposal_details: Dict[str, Any], include_comments: bo
         proposal_details: Dictionary containing proposal details
         include_comments: Whether to include comments in the text
         max_comments: Maximum number of comments to include
+        comment_chars: Total characters of comment text to include
         
     Returns:
         str: Formatted proposal text
@@ -20,11 +55,36 @@ def prepare_proposal_text(proposal_details: Dict[str, Any], include_comments: bo
     # Add comments if requested and available
     if include_comments and proposal_details.get('comments'):
         text_parts.append("\nKey Comments:")
-        for comment in proposal_details['comments'][:max_comments]:
-            text_parts.append(f"\n- {comment['content'][:500]}...")
+        comments = [comment['content'] for comment in proposal_details['comments'][:max_comments]]
+        for excerpt in _comment_excerpts(comments, comment_chars):
+            text_parts.append(f"\n- {excerpt}")
     
     return "\n".join(text_parts)
 
+def _comment_excerpts(comments: List[str], budget: int) -> List[str]:
+    """
+    Shorten comments to fit a shared character budget.
+    
+    Comments are given an equal share, shortest first, so the room a short
+    comment leaves is passed on to the longer ones.
+    
+    Args:
+        comments: Comment texts, in order
+        budget: Total characters available to the comments
+        
+    Returns:
+        list: The comments in the same order, truncated ones ending in "..."
+    """
+    excerpts = [''] * len(comments)
+    remaining = budget
+    by_length = sorted(range(len(comments)), key=lambda i: len(comments[i]))
+    for position, i in enumerate(by_length):
+        share = remaining // (len(comments) - position)
+        text = comments[i]
+        excerpts[i] = text if len(text) <= share else f"{text[:share]}..."
+        remaining -= min(len(text), share)
+    return excerpts
+
 def clean_html_content(html_content: str) -> str:
     """
     Clean HTML content by removing tags and formatting text.
@@ -35,27 +95,162 @@ def clean_html_content(html_content: str) -> str:
     Returns:
         str: Cleaned text content
     """
-    # Basic HTML cleaning - can be enhanced with a proper HTML parser if needed
-    text = html_content.replace('<br>', '\n')
-    text = text.replace('</p>', '\n')
-    text = text.replace('</div>', '\n')
-    text = text.replace('</li>', '\n')
-    text = text.replace('</h1>', '\n')
-    text = text.replace('</h2>', '\n')
-    text = text.replace('</h3>', '\n')
-    text = text.replace('</h4>', '\n')
-    text = text.replace('</h5>', '\n')
-    text = text.replace('</h6>', '\n')
-    
-    # Remove HTML tags
-    while '<' in text and '>' in text:
-        start = text.find('<')
-        end = text.find('>', start)
-        if end == -1:
-            break
-        text = text[:start] + text[end + 1:]
-    
-    # Clean up whitespace
-    lines = [line.strip() for line in text.split('\n')]
-    lines = [line for line in lines if line]
-    return '\n'.join(lines) 
\ No newline at end of file
+    # Text without markup comes out of the parser unchanged, so skip building the DOM
+    if not _MARKUP_RE.search(html_content):
+        return _normalize_lines(html_content)
+    
+    # Short snippets are cheaper to strip with a regex when their markup allows it
+    if len(html_content) < _SMALL_HTML_CHARS:
+        text = _strip_simple_html(html_content)
+        if text is not None:
+            return text
+    
+    # Parse with lexbor, drop repeated text and mark line breaks before extracting the text
+    tree = LexborHTMLParser(html_content)
+    if tree.body is None:
+        return ''
+    for node in tree.css(_DROPPED_SELECTOR):
+        node.decompose()
+    for node in tree.css('br'):
+        node.replace_with('\n')
+    for node in tree.css(_BLOCK_SELECTOR):
+        node.insert_after('\n')
+    return _normalize_lines(tree.body.text(separator=''))
+
+def _normalize_lines(text: str) -> str:
+    """Strip whitespace from each line of text and drop the empty lines"""
+    return '\n'.join(filter(None, (line.strip() for line in text.split('\n'))))
+
+def _strip_simple_html(html_content: str) -> Optional[str]:
+    """
+    Clean HTML that only uses unnested paragraphs, line breaks and inline tags.
+    
+    Args:
+        html_content: HTML content to clean
+        
+    Returns:
+        str: Cleaned text content, or None if the markup needs a full parse
+    """
+    if '\r' in html_content or '\x00' in html_content:
+        return None
+    
+    # Split into text, closing slash, tag name and attributes, repeating
+    parts = _SIMPLE_TAG_RE.split(html_content)
+    if html_content.count('<') != len(parts) // 4:
+        return None
+    
+    text_parts = [html.unescape(parts[0])]
+    in_paragraph = False
+    for i in range(1, len(parts), 4):
+        closing, tag = parts[i], parts[i + 1]
+        if tag == 'br':
+            if closing:
+                return None
+            text_parts.append('\n')
+        elif tag == 'p':
+            if bool(closing) != in_paragraph:
+                return None
+            if closing:
+                text_parts.append('\n')
+            in_paragraph = not in_paragraph
+        text_parts.append(html.unescape(parts[i + 3]))
+    if in_paragraph:
+        return None
+    
+    return _normalize_lines(''.join(text_parts))
+
+def extract_json(response_text: str) -> Dict[str, Any]:
+    """
+    Extract the JSON object embedded in a model response.
+    
+    The span between the first opening and last closing brace is decoded
+    with orjson. If that fails, for instance because another brace follows
+    the object, decoding falls back to reading forward from the first
+    opening brace and ignoring whatever comes after the object.
+    
+    Args:
+        response_text: Text of the model response
+        
+    Returns:
+        dict: Decoded JSON object
+    """
+    json_start = response_text.find('{')
+    if json_start < 0:
+        raise ValueError("No valid JSON found in response")
+    try:
+        return orjson.loads(response_text[json_start:response_text.rfind('}') + 1])
+    except orjson.JSONDecodeError:
+        result, _ = _JSON_DECODER.raw_decode(response_text, json_start)
+        return result
+
+def extract_tool_input(message: Any, tool: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the arguments of the tool call in a model response.
+    
+    A call cut off at max_tokens carries partial arguments, so it is rejected
+    like a call missing any argument the tool schema requires.
+    
+    Args:
+        message: Message returned by the Claude API
+        tool: Definition of the tool the model was required to call
+        
+    Returns:
+        dict: Input the model passed to the tool
+    """
+    if message.stop_reason == 'max_tokens':
+        raise ValueError("Tool call was cut off at max_tokens")
+    for block in message.content:
+        if block.type == 'tool_use' and block.name == tool['name']:
+            result = dict(block.input)
+            missing = [key for key in tool['input_schema'].get('required', []) if key not in result]
+            if missing:
+                raise ValueError(f"Tool call is missing {', '.join(missing)}")
+            return result
+    raise ValueError("No tool call found in response")
+
+def extract_json_stream(chunks: Iterable[str]) -> Dict[str, Any]:
+    """
+    Extract the JSON object from a streamed model response.
+    
+    Decoding is attempted whenever the braces seen so far balance, so the
+    object is returned as soon as it is complete and the rest of the stream
+    is never read.
+    
+    Args:
+        chunks: Text chunks of the model response, in order
+        
+    Returns:
+        dict: Decoded JSON object
+    """
+    parts = []
+    depth = 0
+    started = False
+    for chunk in chunks:
+        parts.append(chunk)
+        opens = chunk.count('{')
+        closes = chunk.count('}')
+        started = started or opens > 0
+        depth += opens - closes
+        if started and closes and depth <= 0:
+            try:
+                return extract_json(''.join(parts))
+            except ValueError:
+                # A brace inside a string value balanced the count early, keep reading
+                pass
+    return extract_json(''.join(parts))
+
+def unique_points(points: Iterable[str]) -> List[str]:
+    """
+    Remove points that only differ in case, surrounding punctuation or whitespace.
+    
+    Args:
+        points: Points collected from several analyses, in order
+        
+    Returns:
+        list: The first occurrence of each distinct point, in order
+    """
+    seen = {}
+    for point in points:
+        key = _WHITESPACE_RE.sub(' ', _PUNCTUATION_RE.sub(' ', point.lower())).strip()
+        seen.setdefault(key, point)
+    return list(seen.values())
\ No newline at end of file
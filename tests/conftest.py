@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+import pytest
+
+class StubMessages:
+    """Stand-in for client.messages that answers every request with reply(params)"""
+    def __init__(self, reply=None):
+        self.reply = reply
+        self.requests = []
+        self.batches = StubBatches(self)
+
+    def create(self, **params):
+        self.requests.append(params)
+        return self.reply(params)
+
+class StubBatches:
+    """Stand-in for client.messages.batches that answers with the same replies as the messages"""
+    def __init__(self, messages):
+        self.messages = messages
+        self.requests = []
+
+    def create(self, requests):
+        self.requests = requests
+        return SimpleNamespace(id="batch", processing_status="in_progress")
+
+    def retrieve(self, batch_id):
+        return SimpleNamespace(id=batch_id, processing_status="ended")
+
+    def results(self, batch_id):
+        # Results come back in reverse order and the last request errored
+        entries = []
+        for request in reversed(self.requests):
+            if request is self.requests[-1]:
+                result = SimpleNamespace(type="errored")
+            else:
+                result = SimpleNamespace(type="succeeded", message=self.messages.reply(request["params"]))
+            entries.append(SimpleNamespace(custom_id=request["custom_id"], result=result))
+        return entries
+
+@pytest.fixture
+def stub_claude(monkeypatch):
+    """Replace the ClaudeClient of a module with one whose messages are a StubMessages"""
+    def install(module, reply=None):
+        messages = StubMessages(reply)
+        client = SimpleNamespace(messages=messages)
+        monkeypatch.setattr(module, "ClaudeClient", SimpleNamespace(get_instance=lambda: SimpleNamespace(client=client)))
+        return messages
+    return install
\ No newline at end of file
@@ -1,8 +1,9 @@
 from src.discourse_parser import DiscourseParser
 from src.sentiment_analyzer import SentimentAnalyzer
 from src.proposal_analyzer import ProposalAnalyzer
-from src.evaluator_agent import EvaluatorAgent
-import json
+from src.evaluator_agents import EvaluatorAgent
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 def test_proposal_analysis(url: str, analyze_sentiment: bool = True) -> None:
@@ -22,19 +23,28 @@ def test_proposal_analysis(url: str, analyze_sentiment: bool = True) -> None:
     parser = DiscourseParser()
     proposal_data = parser.parse_proposal(url)
     
-    # Analyze proposal content
+    # Analyze proposal content, the evaluation needs its primary category and the comment analysis its summary
     analyzer = ProposalAnalyzer()
     analysis_result = analyzer.analyze_proposal(proposal_data)
     
-    # Get detailed evaluation
+    # The evaluation and comment analysis are independent of each other, so run them together
     evaluator = EvaluatorAgent()
-    detailed_eval = evaluator.evaluate_proposal(proposal_data)
-    
-    # Analyze comments if requested
-    sentiment_result = None
-    if analyze_sentiment and proposal_data.get('comments'):
-        sentiment_analyzer = SentimentAnalyzer()
-        sentiment_result = sentiment_analyzer.analyze_all_comments(proposal_data['comments'])
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Get detailed evaluation
+        evaluation_future = executor.submit(
+            evaluator.evaluate_proposal, analysis_result['primary_category'], proposal_data
+        )
+        
+        # Analyze comments if requested
+        sentiment_future = None
+        if analyze_sentiment and proposal_data.get('comments'):
+            sentiment_analyzer = SentimentAnalyzer()
+            sentiment_future = executor.submit(
+                sentiment_analyzer.analyze_all_comments, proposal_data['comments'], analysis_result['summary']
+            )
+        
+        detailed_eval = evaluation_future.result()
+        sentiment_result = sentiment_future.result() if sentiment_future else None
     
     # Combine results
     results = {
@@ -53,14 +63,14 @@ def test_proposal_analysis(url: str, analyze_sentiment: bool = True) -> None:
     proposal_title = proposal_data['title'].lower().replace(' ', '_')[:50]
     filename = f"analysis_results_{proposal_title}_{timestamp}.json"
     
-    with open(filename, 'w') as f:
-        json.dump(results, f, indent=2)
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
     
     # Print summary
     print("\nAnalysis Summary:")
     print(f"Primary Category: {analysis_result['primary_category']}")
     print(f"Category Score: {analysis_result[analysis_result['primary_category']]:.2f}")
-    print(f"Detailed Evaluation Score: {detailed_eval['overall_score']:.2f}")
+    print(f"Detailed Evaluation Score: {detailed_eval['score']:.2f}")
     
     if sentiment_result:
         print(f"\nComment Analysis:")
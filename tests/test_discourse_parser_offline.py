@@ -0,0 +1,79 @@
+import os
+import time
+import orjson
+import pytest
+import requests
+from types import SimpleNamespace
+from src.discourse_parser import DiscourseParser
+
+def topic(title, num_comments=0):
+    posts = [{"cooked": f"<p>{title}</p>", "created_at": "2024-01-01", "username": "author"}]
+    posts += [
+        {"cooked": f"<p>Reply {i}</p>", "created_at": "2024-01-02", "username": f"user{i}"}
+        for i in range(num_comments)
+    ]
+    return {"title": title, "created_at": "2024-01-01", "post_stream": {"posts": posts}}
+
+class StubSession:
+    """Serves topics by ID and fails with a 404 for any other topic"""
+    def __init__(self, topics):
+        self.topics = topics
+        self.requested = []
+
+    def get(self, url, timeout=None):
+        self.requested.append(url)
+        topic_id = url.rsplit('/', 1)[1].removesuffix('.json')
+        if topic_id not in self.topics:
+            def raise_for_status():
+                raise requests.HTTPError(f"404 for {url}")
+            return SimpleNamespace(content=b"", raise_for_status=raise_for_status)
+        return SimpleNamespace(content=orjson.dumps(self.topics[topic_id]), raise_for_status=lambda: None)
+
+def make_parser(tmp_path, topics, cache_ttl=3600):
+    parser = DiscourseParser(cache_ttl=cache_ttl, cache_dir=str(tmp_path))
+    parser.session = StubSession(topics)
+    return parser
+
+def test_fetch_topic_serves_cache_until_ttl(tmp_path):
+    parser = make_parser(tmp_path, {"1": topic("Fund audits")}, cache_ttl=60)
+    assert parser.fetch_topic("https://forum.example", "1")["title"] == "Fund audits"
+    assert parser.fetch_topic("https://forum.example", "1")["title"] == "Fund audits"
+    assert len(parser.session.requested) == 1
+
+    # An entry older than the TTL is fetched again
+    (cache_path,) = tmp_path.iterdir()
+    expired = time.time() - 120
+    os.utime(cache_path, (expired, expired))
+    parser.fetch_topic("https://forum.example", "1")
+    assert len(parser.session.requested) == 2
+
+def test_fetch_topic_cache_disabled(tmp_path):
+    parser = make_parser(tmp_path, {"1": topic("Fund audits")}, cache_ttl=0)
+    parser.fetch_topic("https://forum.example", "1")
+    parser.fetch_topic("https://forum.example", "1")
+    assert len(parser.session.requested) == 2
+    assert not any(tmp_path.iterdir())
+
+def test_extract_proposal_details_max_comments(tmp_path):
+    parser = make_parser(tmp_path, {})
+    details = parser.extract_proposal_details(topic("Fund audits", num_comments=5), max_comments=2)
+    assert details["content"] == "Fund audits"
+    assert [c["content"] for c in details["comments"]] == ["Reply 0", "Reply 1"]
+    assert len(parser.extract_proposal_details(topic("Fund audits", num_comments=5))["comments"]) == 5
+    assert parser.extract_proposal_details(topic("Fund audits", num_comments=5), max_comments=0)["comments"] == []
+
+def test_parse_proposals_keeps_errors_in_place(tmp_path):
+    parser = make_parser(tmp_path, {"fund-audits": topic("Fund audits"), "raise-the-quorum": topic("Raise the quorum")},
+                         cache_ttl=0)
+    urls = [
+        "https://forum.example/t/fund-audits/1",
+        "https://forum.example/t/missing/2",
+        "https://forum.example/not-a-topic",
+        "https://forum.example/t/raise-the-quorum/3"
+    ]
+    results = parser.parse_proposals(urls, max_workers=4)
+    assert results[0]["title"] == "Fund audits"
+    assert isinstance(results[1], requests.HTTPError)
+    assert isinstance(results[2], ValueError)
+    assert results[3]["title"] == "Raise the quorum"
+    assert parser.parse_proposals([]) == []
\ No newline at end of file
@@ -0,0 +1,52 @@
+import re
+from types import SimpleNamespace
+import pytest
+import src.evaluator_agents as evaluator_agents
+from src.evaluator_agents import EvaluatorAgent
+
+SCORES = {"protocol_parameters": 8.0, "treasury_management": 5.0, "tokenomics": 1.0, "risk_management": 2.0}
+
+PROPOSAL = {"title": "Raise the borrow cap", "content": "Raise the USDC borrow cap to 10M.", "comments": []}
+
+def tool_message(score):
+    tool_input = {"score": score, "reasoning": "r", "key_findings": [], "information_gaps": [], "recommendations": []}
+    return SimpleNamespace(stop_reason="tool_use", content=[
+        SimpleNamespace(type="tool_use", name="submit_evaluation", input=tool_input)
+    ])
+
+def request_category(agent, params):
+    # Each request starts with its category's prompt prefix, which identifies the category
+    prefix = params["messages"][0]["content"][0]["text"]
+    return next(category for category, p in agent.prompt_prefixes.items() if p == prefix)
+
+@pytest.fixture
+def evaluator(stub_claude):
+    messages = stub_claude(evaluator_agents)
+    agent = EvaluatorAgent(cache_ttl=0)
+    messages.reply = lambda params: tool_message(SCORES[request_category(agent, params)])
+    return agent
+
+def test_evaluate_all_categories_weights_evaluated_scores(evaluator):
+    weights = {"protocol_parameters": 0.6, "treasury_management": 0.3, "tokenomics": 0.05, "risk_management": 0.05}
+    result = evaluator.evaluate_all_categories(PROPOSAL, weights, min_weight=0.05)
+    
+    # Categories at or below min_weight are skipped and the rest are normalised to their share
+    requested = [request_category(evaluator, params) for params in evaluator.client.messages.requests]
+    assert sorted(requested) == ["protocol_parameters", "treasury_management"]
+    assert set(result["evaluations"]) == {"protocol_parameters", "treasury_management"}
+    assert result["score"] == pytest.approx((0.6 * 8.0 + 0.3 * 5.0) / 0.9)
+    assert result["evaluations"]["treasury_management"]["category"] == "treasury_management"
+
+def test_evaluate_batch_maps_results_by_custom_id(evaluator):
+    proposals = [
+        ("protocol_parameters", PROPOSAL),
+        ("treasury_management", PROPOSAL),
+        ("tokenomics", PROPOSAL)
+    ]
+    results = evaluator.evaluate_batch(proposals, poll_interval=0)
+    
+    batches = evaluator.client.messages.batches
+    assert all(re.fullmatch(r"[a-zA-Z0-9_-]{1,64}", request["custom_id"]) for request in batches.requests)
+    assert [(r["category"], r["score"]) for r in results[:2]] == [("protocol_parameters", 8.0), ("treasury_management", 5.0)]
+    assert results[2]["score"] == 0.0
+    assert "errored" in results[2]["reasoning"]
\ No newline at end of file
@@ -0,0 +1,23 @@
+from src.llm_cache import LLMCache
+
+def test_llm_cache_round_trip(tmp_path):
+    cache = LLMCache(str(tmp_path))
+    key = LLMCache.make_key("model", 0.1, "prompt")
+    assert cache.get(key) is None
+    cache.set(key, {"score": 0.5, "key_findings": []})
+    assert cache.get(key) == {"score": 0.5, "key_findings": []}
+    assert key != LLMCache.make_key("model", 0.1, "other prompt")
+
+def test_llm_cache_disabled(tmp_path):
+    cache = LLMCache(str(tmp_path), ttl=0)
+    cache.set("key", {"score": 0.5})
+    assert cache.get("key") is None
+    assert not any(tmp_path.iterdir())
+
+def test_llm_cache_write_failure_is_ignored(tmp_path):
+    # A file where the cache directory should be makes every write fail
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    cache = LLMCache(str(blocker / "llm"))
+    cache.set("key", {"score": 0.5})
+    assert cache.get("key") is None
\ No newline at end of file
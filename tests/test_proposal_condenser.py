@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+import src.proposal_condenser as proposal_condenser
+from src.proposal_condenser import ProposalCondenser
+
+def make_condenser(stub_claude, tmp_path, stop_reason):
+    reply = SimpleNamespace(content=[SimpleNamespace(type="text", text=" Condensed ")], stop_reason=stop_reason)
+    messages = stub_claude(proposal_condenser, lambda params: reply)
+    return ProposalCondenser(max_chars=10, cache_dir=str(tmp_path)), messages
+
+def test_condense_long_proposal(stub_claude, tmp_path):
+    condenser, messages = make_condenser(stub_claude, tmp_path, "end_turn")
+    details = {"title": "T", "content": "x" * 20}
+    assert condenser.condense({"title": "T", "content": "short"}) == {"title": "T", "content": "short"}
+    assert condenser.condense(details) == {"title": "T", "content": "Condensed"}
+    assert condenser.condense(details) == {"title": "T", "content": "Condensed"}
+    assert len(messages.requests) == 1
+
+def test_condense_truncated_reply_falls_back(stub_claude, tmp_path):
+    condenser, messages = make_condenser(stub_claude, tmp_path, "max_tokens")
+    details = {"title": "T", "content": "x" * 20}
+    assert condenser.condense(details) is details
+    assert condenser.condense(details) is details
+    assert len(messages.requests) == 2
+    assert not any(tmp_path.iterdir())
\ No newline at end of file
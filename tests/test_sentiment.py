@@ -1,7 +1,7 @@
 from src.discourse_parser import DiscourseParser
 from src.sentiment_analyzer import SentimentAnalyzer
 from src.proposal_analyzer import ProposalAnalyzer
-import json
+import orjson
 from datetime import datetime
 
 def test_sentiment_analysis(url: str) -> None:
@@ -26,10 +26,7 @@ def test_sentiment_analysis(url: str) -> None:
     
     # Step 2: Get proposal summary from proposal analyzer
     analyzer = ProposalAnalyzer()
-    analysis_results = analyzer.analyze_proposal({
-        'title': proposal_data['title'],
-        'content': proposal_data['content']
-    })
+    analysis_results = analyzer.analyze_proposal(proposal_data)
     
     # Step 3: Analyze comments
     sentiment_analyzer = SentimentAnalyzer()
@@ -50,8 +47,8 @@ def test_sentiment_analysis(url: str) -> None:
     }
     
     output_file = f"sentiment_analysis_{proposal_data['title'].lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
     
     print(f"\nSentiment Analysis Results:")
     print(f"Overall Sentiment Score: {comment_analysis['overall_sentiment']:.2f}")
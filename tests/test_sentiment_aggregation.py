@@ -0,0 +1,24 @@
+import statistics
+import pytest
+import src.sentiment_analyzer as sentiment_analyzer
+from src.sentiment_analyzer import SentimentAnalyzer
+
+BATCH_SCORES = {"a": 1.0, "c": 0.5, "e": -1.0}
+
+def test_analyze_all_comments_weights_scores_by_batch_size(stub_claude):
+    stub_claude(sentiment_analyzer)
+    analyzer = SentimentAnalyzer(batch_size=2, cache_ttl=0)
+    analyzer.analyze_comment_batch = lambda batch, summary, bypass_cache=False: {
+        "sentiment_score": BATCH_SCORES[batch[0]["content"]],
+        "summary": f"{len(batch)} comments",
+        "key_points": ["Lower fees."],
+        "concerns": [],
+        "suggestions": []
+    }
+    
+    # Batches of two, two and one comment, the last one negative
+    result = analyzer.analyze_all_comments([{"content": c} for c in "abcde"], "Summary")
+    assert result["sentiment_score"] == pytest.approx((1.0 * 2 + 0.5 * 2 - 1.0) / 5)
+    assert result["sentiment_std"] == pytest.approx(statistics.pstdev(BATCH_SCORES.values()))
+    assert result["num_comments"] == 5
+    assert result["key_points"] == ["Lower fees."]
\ No newline at end of file
@@ -0,0 +1,47 @@
+import time
+from src.similarity_cache import SimilarityCache
+
+PROPOSAL = " ".join(f"Allocate {i} grants to builder cohort {i % 5} this quarter." for i in range(40))
+
+def test_similarity_cache_matches_near_duplicates(tmp_path):
+    cache = SimilarityCache(str(tmp_path / "similar.json"))
+    cache.add("ns", PROPOSAL, {"primary_category": "treasury_management"})
+    edited = PROPOSAL.replace("Allocate 3 grants", "Allocate three grants")
+    assert cache.get("ns", edited) == {"primary_category": "treasury_management"}
+    assert cache.get("other-ns", edited) is None
+    assert cache.get("ns", "Raise the quorum to four percent of delegated votes") is None
+
+def test_similarity_cache_persists(tmp_path):
+    path = str(tmp_path / "similar.json")
+    cache = SimilarityCache(path)
+    cache.add("ns", PROPOSAL, {"sum": 1.0})
+    cache.save()
+    assert SimilarityCache(path).get("ns", PROPOSAL) == {"sum": 1.0}
+
+def test_similarity_cache_expires_entries(tmp_path, monkeypatch):
+    path = str(tmp_path / "similar.json")
+    cache = SimilarityCache(path, ttl=60)
+    cache.add("ns", PROPOSAL, {"sum": 1.0})
+    cache.save()
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("ns", PROPOSAL) is None
+    assert SimilarityCache(path, ttl=60).get("ns", PROPOSAL) is None
+
+def test_similarity_cache_replaces_matching_entry(tmp_path):
+    cache = SimilarityCache(str(tmp_path / "similar.json"), max_entries=2)
+    cache.add("ns", PROPOSAL, {"sum": 0.5})
+    cache.add("ns", PROPOSAL, {"sum": 1.0})
+    assert cache.get("ns", PROPOSAL) == {"sum": 1.0}
+    cache.add("ns", "Raise the quorum to four percent of delegated votes", {"sum": 0.2})
+    cache.add("ns", "Fund a security audit of the new lending market", {"sum": 0.3})
+    assert len(cache._entries) == 2
+    assert cache.get("ns", PROPOSAL) is None
+
+def test_similarity_cache_save_failure_is_ignored(tmp_path):
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    cache = SimilarityCache(str(blocker / "similar.json"))
+    cache.add("ns", PROPOSAL, {"sum": 1.0})
+    cache.save()
+    assert list(tmp_path.iterdir()) == [blocker]
\ No newline at end of file
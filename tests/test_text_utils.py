@@ -0,0 +1,91 @@
+import pytest
+from types import SimpleNamespace
+from src.text_utils import clean_html_content, extract_json, extract_json_stream, extract_tool_input, unique_points, prepare_proposal_text
+
+def test_clean_html_content_block_elements():
+    html = "<p>Hello <b>bold</b> world</p><ul><li>first</li><li>second</li></ul>line<br>break"
+    assert clean_html_content(html) == "Hello bold world\nfirst\nsecond\nline\nbreak"
+
+def test_clean_html_content_whitespace():
+    html = "<p>  spaced  </p>\n\n\n<div>\n  next\n</div>"
+    assert clean_html_content(html) == "spaced\nnext"
+
+def test_clean_html_content_short_snippet():
+    html = '<p>Fees &amp; <a href="https://x.y/?a=1&amp;b=2">limits</a></p>\n<p>one<br>two</p>'
+    assert clean_html_content(html) == "Fees & limits\none\ntwo"
+    # Unclosed paragraphs need the parser to place the line breaks
+    assert clean_html_content("<p>first<p>second") == "first\nsecond"
+
+def test_clean_html_content_plain_text():
+    assert clean_html_content("  first line  \n\n second line ") == "first line\nsecond line"
+    assert clean_html_content("fish &amp; chips\r\nnext") == "fish & chips\nnext"
+
+def test_clean_html_content_empty():
+    assert clean_html_content("") == ""
+
+def test_extract_json_ignores_surrounding_text():
+    response = 'Here is the analysis: {"score": 0.5, "reasoning": "a } b"} Note: {not json}'
+    assert extract_json(response) == {"score": 0.5, "reasoning": "a } b"}
+
+def test_extract_json_no_object():
+    with pytest.raises(ValueError):
+        extract_json("No JSON here")
+
+
+def test_extract_json_stream_stops_at_object_end():
+    def chunks():
+        yield 'Analysis: {"score": 0.'
+        yield '5, "reasoning": "a } b"'
+        yield '} trailing'
+        raise AssertionError("read past the end of the object")
+    assert extract_json_stream(chunks()) == {"score": 0.5, "reasoning": "a } b"}
+
+def test_extract_json_stream_no_object():
+    with pytest.raises(ValueError):
+        extract_json_stream(["No ", "JSON here"])
+
+TOOL = {"name": "submit", "input_schema": {"type": "object", "required": ["score", "summary"]}}
+
+def tool_message(tool_input, stop_reason="tool_use"):
+    return SimpleNamespace(stop_reason=stop_reason, content=[
+        SimpleNamespace(type="text", text="Calling the tool"),
+        SimpleNamespace(type="tool_use", name="submit", input=tool_input)
+    ])
+
+def test_extract_tool_input():
+    assert extract_tool_input(tool_message({"score": 0.5, "summary": "s"}), TOOL) == {"score": 0.5, "summary": "s"}
+    with pytest.raises(ValueError):
+        extract_tool_input(SimpleNamespace(stop_reason="end_turn", content=[SimpleNamespace(type="text", text="{}")]), TOOL)
+
+def test_extract_tool_input_rejects_incomplete_calls():
+    with pytest.raises(ValueError, match="max_tokens"):
+        extract_tool_input(tool_message({"score": 0.5, "summary": "s"}, stop_reason="max_tokens"), TOOL)
+    with pytest.raises(ValueError, match="summary"):
+        extract_tool_input(tool_message({"score": 0.5}), TOOL)
+
+def test_clean_html_drops_quotes_and_oneboxes():
+    html_content = (
+        '<aside class="quote" data-username="alice"><div class="title">alice:</div>'
+        '<blockquote><p>' + 'Quoted text. ' * 40 + '</p></blockquote></aside>'
+        '<p>I disagree with this.</p>'
+        '<aside class="onebox"><article><h3>Linked page</h3><p>Preview</p></article></aside>'
+        '<p>End</p>'
+    )
+    assert clean_html_content(html_content) == "I disagree with this.\nEnd"
+
+def test_unique_points_merges_rewordings():
+    points = ["Concern about fees", "concern about  fees.", "Timeline is too short", "CONCERN ABOUT FEES!"]
+    assert unique_points(points) == ["Concern about fees", "Timeline is too short"]
+
+def test_unique_points_keeps_distinct_numbers():
+    points = ["Reduce quorum to 2.5%", "Reduce quorum to 25%", "reduce quorum to 2.5%.", "Cap at 1,000 ETH", "Cap at 1000 ETH"]
+    assert unique_points(points) == ["Reduce quorum to 2.5%", "Reduce quorum to 25%", "Cap at 1,000 ETH", "Cap at 1000 ETH"]
+
+def test_prepare_proposal_text_shares_comment_budget():
+    details = {
+        'title': "T",
+        'content': "Body",
+        'comments': [{'content': "Short"}, {'content': "x" * 100}, {'content': "y" * 100}, {'content': "Not quoted"}]
+    }
+    text = prepare_proposal_text(details, comment_chars=105)
+    assert text == "Title: T\n\nProposal Content:\nBody\n\nKey Comments:\n\n- Short\n\n- " + "x" * 50 + "...\n\n- " + "y" * 50 + "..."
\ No newline at end of file